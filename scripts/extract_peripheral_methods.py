@@ -5,13 +5,16 @@ and generate Lua LSP type definitions.
 
 This script scans Java peripheral classes for @LuaFunction annotated methods,
 extracts their signatures and documentation, and generates .lua type definition files.
+Optionally, definitions can be generated for one or more specific CC-Tweaked versions,
+using @cc.since data to drop methods and classes that do not exist in that version.
 """
 
+import argparse
 import re
 import sys
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
 
 @dataclass
@@ -47,6 +50,7 @@ class PeripheralClass:
     parent_classes: List[str]
     methods: List[MethodDef]
     class_doc: str = ""
+    since: str = ""
 
 
 # Java type to Lua type mappings
@@ -79,6 +83,10 @@ BASE_CLASSES = {
     # Add other base classes as needed
 }
 
+# Manifest listing the files generated into a version directory, so that re-running
+# only ever removes files this script created
+GENERATED_MANIFEST = ".generated-files"
+
 
 def normalize_java_type(java_type: str) -> str:
     """Normalize Java type to handle generics and simplify."""
@@ -181,6 +189,108 @@ def extract_since(javadoc: str) -> str:
     return match.group(1) if match else ""
 
 
+def parse_version(version: str) -> Optional[Tuple[int, ...]]:
+    """Parse a version string like "1.94.0" or "1.80pr1" into a comparable tuple.
+
+    Only the leading dotted numeric part is used, so pre-release suffixes are ignored.
+    Returns None if the string does not start with a number.
+    """
+    match = re.match(r'\d+(?:\.\d+)*', version.strip())
+    if not match:
+        return None
+    parts = [int(part) for part in match.group(0).split('.')]
+    # Drop trailing zeros so that "1.94" and "1.94.0" compare equal
+    while len(parts) > 1 and parts[-1] == 0:
+        parts.pop()
+    return tuple(parts)
+
+
+def is_available(since: str, target: Tuple[int, ...]) -> bool:
+    """Check if something introduced in version `since` exists in the target version.
+
+    Anything without (or with an unparseable) @cc.since tag is assumed to always exist.
+    """
+    since_version = parse_version(since) if since else None
+    if since_version is None:
+        return True
+    return since_version <= target
+
+
+def filter_for_version(peripheral: PeripheralClass, target: Tuple[int, ...]) -> Optional[PeripheralClass]:
+    """Return a copy of a peripheral containing only what exists in the target version.
+
+    Returns None if the peripheral itself was introduced after the target version.
+    Aliases are emitted as separate MethodDefs sharing the same @cc.since, so they are
+    filtered along with their primary method.
+
+    Parent classes are dropped: inherited methods have already been merged in (and are
+    filtered here), whereas the hand-written parent types (e.g. ccTweaked.term.Redirect)
+    have no version information and would bring the filtered methods back.
+    """
+    if not is_available(peripheral.since, target):
+        return None
+    
+    methods = [m for m in peripheral.methods if is_available(m.since, target)]
+    return replace(peripheral, methods=methods, parent_classes=[])
+
+
+def count_functions(methods: List[MethodDef]) -> int:
+    """Count methods, treating all aliases of a method as one."""
+    return len({m.aliases[0] if m.aliases else m.name for m in methods})
+
+
+def skip_annotations(text: str) -> str:
+    """Strip leading Java annotations (including nested arguments) and whitespace from text."""
+    while True:
+        text = text.lstrip()
+        annotation_match = re.match(r'@[\w.]+\s*', text)
+        if not annotation_match:
+            return text
+        text = text[annotation_match.end():]
+        if not text.startswith('('):
+            continue
+        
+        # Skip the balanced argument list, ignoring parentheses inside string literals
+        depth = 0
+        in_string = None
+        escaped = False
+        for i, char in enumerate(text):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == in_string:
+                    in_string = None
+            elif char in '"\'':
+                in_string = char
+            elif char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+                if depth == 0:
+                    text = text[i + 1:]
+                    break
+        else:
+            # Unbalanced parentheses, give up
+            return text
+
+
+def find_class_javadoc(content: str, class_start: int) -> Optional[str]:
+    """Find the Javadoc directly preceding the class declaration at class_start.
+
+    Only annotations may appear between the Javadoc and the declaration.
+    """
+    before = content[:class_start]
+    doc_end = before.rfind('*/')
+    doc_start = before.rfind('/**', 0, doc_end)
+    if doc_end == -1 or doc_start == -1:
+        return None
+    if skip_annotations(before[doc_end + 2:]):
+        return None
+    return before[doc_start + 3:doc_end].strip()
+
+
 def extract_method_signature(method_code: str) -> Optional[Tuple[str, List[str], List[Tuple[str, str, str, bool]], str]]:
     """Extract method signature: return_type, aliases, params, javadoc.
     
@@ -318,7 +428,7 @@ def parse_java_file(file_path: Path, base_path: Path, parsed_classes: Optional[D
         return None
     
     # Extract class name and package
-    class_match = re.search(r'public\s+(?:abstract\s+)?class\s+(\w+)(?:\s+extends\s+([\w.]+))?(?:\s+implements\s+([\w\s,<>]+))?', content)
+    class_match = re.search(r'public\s+(?:(?:abstract|final)\s+)?class\s+(\w+)(?:\s+extends\s+([\w.]+))?(?:\s+implements\s+([\w\s,<>]+))?', content)
     if not class_match:
         return None
     
@@ -364,6 +474,13 @@ def parse_java_file(file_path: Path, base_path: Path, parsed_classes: Optional[D
     class_doc_match = re.search(r'/\*\*(.*?)\*/.*?public\s+class', content, re.DOTALL)
     class_doc = class_doc_match.group(1).strip() if class_doc_match else ""
     
+    # Read @cc.since from the Javadoc attached to the actual declaration, which also
+    # covers abstract and final classes
+    declaration_doc = find_class_javadoc(content, class_match.start())
+    if declaration_doc is None:
+        print(f"Warning: No class Javadoc found for {class_name}, assuming it exists in all versions", file=sys.stderr)
+    class_since = extract_since(declaration_doc or "")
+    
     # Extract parent classes - get full qualified name and class name
     parent_classes = [parent_full_names[0].split('.')[-1]] if parent_full_names else []
     
@@ -456,7 +573,8 @@ def parse_java_file(file_path: Path, base_path: Path, parsed_classes: Optional[D
         type_name=type_name,
         parent_classes=parent_classes,
         methods=methods,
-        class_doc=class_doc
+        class_doc=class_doc,
+        since=class_since
     )
     
     # Store in parsed_classes to avoid cycles
@@ -595,23 +713,77 @@ def generate_lua_file(peripheral: PeripheralClass, output_dir: Path):
     
     output_file.write_text("\n".join(lines), encoding='utf-8')
     print(f"Generated: {output_file}")
+    return output_file
+
+
+def prepare_version_dir(version_dir: Path):
+    """Remove files generated by a previous run from a version directory.
+
+    Exits with an error if the directory contains .lua files which were not generated
+    by this script, rather than risk deleting or overwriting hand-written stubs.
+    """
+    manifest = version_dir / GENERATED_MANIFEST
+    generated_files = set()
+    if manifest.exists():
+        generated_files = {Path(line).name for line in manifest.read_text(encoding='utf-8').splitlines() if line.strip()}
+    
+    unknown_files = sorted(f.name for f in version_dir.glob("*.lua") if f.name not in generated_files)
+    if unknown_files:
+        print(f"Error: {version_dir} contains files not generated by this script: {', '.join(unknown_files)}", file=sys.stderr)
+        sys.exit(1)
+    
+    for file_name in generated_files:
+        (version_dir / file_name).unlink(missing_ok=True)
+    manifest.unlink(missing_ok=True)
 
 
 def main():
     """Main entry point."""
-    if len(sys.argv) < 3:
-        print("Usage: extract_peripheral_methods.py <cc-tweaked-path> <output-dir>", file=sys.stderr)
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Generate Lua LSP type definitions for CC-Tweaked peripherals."
+    )
+    parser.add_argument("cc_tweaked_path", type=Path, help="Path to the CC-Tweaked repository root")
+    parser.add_argument("output_dir", type=Path, help="Directory where generated .lua files are written")
+    parser.add_argument(
+        "--target-version",
+        action="append",
+        default=[],
+        metavar="X.Y.Z",
+        help="Only include methods and peripherals available in this CC-Tweaked version. "
+             "May be given multiple times; each version is written to <output-dir>/<version>/",
+    )
+    args = parser.parse_args()
     
-    cc_tweaked_path = Path(sys.argv[1])
-    output_dir = Path(sys.argv[2])
+    cc_tweaked_path = args.cc_tweaked_path
+    output_dir = args.output_dir
     
     if not cc_tweaked_path.exists():
         print(f"Error: CC-Tweaked path does not exist: {cc_tweaked_path}", file=sys.stderr)
         sys.exit(1)
     
+    # Validate target versions up front, before doing any parsing. The version is used as a
+    # directory name, so it must be purely numeric (e.g. "1.94.0")
+    target_versions = []
+    seen_versions = set()
+    for version in args.target_version:
+        if not re.fullmatch(r'\d+(?:\.\d+)*', version):
+            print(f"Error: Invalid target version: {version!r}", file=sys.stderr)
+            sys.exit(1)
+        parsed_version = parse_version(version)
+        if parsed_version in seen_versions:
+            print(f"Skipping duplicate target version: {version}")
+            continue
+        seen_versions.add(parsed_version)
+        target_versions.append((version, parsed_version))
+    
     output_dir.mkdir(parents=True, exist_ok=True)
     
+    # Check version directories before doing any parsing
+    for version, _ in target_versions:
+        version_dir = output_dir / version
+        if version_dir.exists():
+            prepare_version_dir(version_dir)
+    
     # Find all peripheral Java files
     common_java_dir = cc_tweaked_path / "projects/common/src/main/java"
     peripheral_files = list(common_java_dir.rglob("*Peripheral.java"))
@@ -643,11 +815,32 @@ def main():
             for source_file, method_names in sorted(method_sources.items()):
                 print(f"  Methods from {source_file}: {', '.join(sorted(method_names))}")
     
-    # Generate Lua files
-    for peripheral in peripherals.values():
-        generate_lua_file(peripheral, output_dir)
+    if not target_versions:
+        # Generate Lua files
+        for peripheral in peripherals.values():
+            generate_lua_file(peripheral, output_dir)
+        
+        print(f"\nGenerated {len(peripherals)} Lua type definition files in {output_dir}")
+        return
     
-    print(f"\nGenerated {len(peripherals)} Lua type definition files in {output_dir}")
+    # Generate a separate, filtered set of Lua files for each target version
+    for version, parsed_version in target_versions:
+        version_dir = output_dir / version
+        version_dir.mkdir(parents=True, exist_ok=True)
+        
+        generated_files = []
+        for peripheral in peripherals.values():
+            filtered = filter_for_version(peripheral, parsed_version)
+            if filtered is None:
+                print(f"Skipped: {peripheral.name} ({peripheral.type_name}) - added in {peripheral.since}")
+                continue
+            removed = count_functions(peripheral.methods) - count_functions(filtered.methods)
+            if removed:
+                print(f"Filtered: {peripheral.name} ({peripheral.type_name}) - dropped {removed} methods newer than {version}")
+            generated_files.append(generate_lua_file(filtered, version_dir).name)
+        
+        (version_dir / GENERATED_MANIFEST).write_text("\n".join(sorted(generated_files)) + "\n", encoding='utf-8')
+        print(f"\nGenerated {len(generated_files)} Lua type definition files for {version} in {version_dir}")
 
 
 if __name__ == "__main__":